@@ -10,15 +10,111 @@ import os
 # # --- End Debug ---
 
 import json
+try:
+    # C JSON codec; much faster than stdlib json on the base64-heavy
+    # payloads this CLI ships, and it skips the per-character escape pass.
+    import orjson
+except ImportError:
+    orjson = None
 import argparse
-from typing import Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, TYPE_CHECKING
 import base64
-from PIL import Image, ImageDraw
-import requests
+try:
+    # SIMD-accelerated (AVX2/SSSE3/NEON) base64; byte-for-byte compatible
+    # with the stdlib API, so it is a drop-in where available.
+    import pybase64 as _b64
+except ImportError:
+    _b64 = base64
 import io
 import time
 from io import BytesIO
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# PIL, numpy, requests and httpx are imported lazily inside the code paths
+# that need them: together they add well over 100 ms of cold start, which
+# `fluxcli --help` and argparse error paths shouldn't pay. After the first
+# import each function-local import is just a sys.modules lookup.
+if TYPE_CHECKING:
+    from PIL import Image
+
+def _make_adapter():
+    """HTTPAdapter with pooling + retries shared by all sessions in this module."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    # POST is included deliberately: task submission is idempotent enough
+    # here (a duplicate submit just queues a second render of the same
+    # prompt, and retries only fire on connect errors / 5xx / 429 before a
+    # usable response). Retry-After from the server takes precedence over
+    # the backoff schedule.
+    retry = Retry(
+        total=4,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=True
+    )
+    return HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+
+# Lazily-created session for plain image downloads (no auth headers needed),
+# so handle_image_url reuses one connection pool across calls.
+_download_session_instance = None
+
+def _download_session():
+    global _download_session_instance
+    if _download_session_instance is None:
+        import requests
+        _download_session_instance = requests.Session()
+        _download_session_instance.mount("https://", _make_adapter())
+    return _download_session_instance
+
+# Frozen lookup tables built once at import instead of re-allocated per call.
+_MODEL_ENDPOINTS = MappingProxyType({
+    "flux.1.1-pro": "/v1/flux-pro-1.1",
+    "flux.1-pro": "/v1/flux-pro",
+    "flux.1-dev": "/v1/flux-dev",
+    "flux.1.1-ultra": "/v1/flux-pro-1.1-ultra",
+})
+
+_CONTROL_ENDPOINTS = MappingProxyType({
+    'canny': '/v1/flux-pro-1.0-canny',
+    'depth': '/v1/flux-pro-1.0-depth',
+    'pose': '/v1/flux-pro-1.0-pose',
+})
+
+_CONTROL_DEFAULTS = MappingProxyType({
+    'canny': {'guidance': 30},
+    'depth': {'guidance': 15},
+    'pose': {'guidance': 25},
+})
+
+_ASPECT_DIMENSIONS = MappingProxyType({
+    '1:1': (1024, 1024),
+    '4:3': (1024, 768),
+    '3:4': (768, 1024),
+    '16:9': (1024, 576),
+    '9:16': (576, 1024),
+})
+
+def _json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+def _json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Keyed on (path, mtime, size) so a file edited in place is re-read, while
+# batch runs reusing one control/reference image pay for the read and the
+# base64 encode only once.
+@lru_cache(maxsize=32)
+def _encode_image_cached(path: str, mtime: float, size: int) -> str:
+    with open(path, 'rb') as image_file:
+        return _b64.b64encode(image_file.read()).decode('utf-8')
 
 class FluxAPI:
     def __init__(self, api_key: Optional[str] = None):
@@ -26,31 +122,113 @@ class FluxAPI:
         if not self.api_key:
             raise ValueError("API key must be provided or set in BFL_API_KEY environment variable")
         self.base_url = "https://api.bfl.ml"
-        self.headers = {"X-Key": self.api_key}
-    
+        # One client per FluxAPI instance: keeps the TLS connection to
+        # api.bfl.ml alive across submissions and the whole polling loop,
+        # instead of paying a fresh TCP+TLS handshake per request. With
+        # httpx installed we get HTTP/2 on top, so concurrent batch polls
+        # share one multiplexed socket rather than one socket each.
+        try:
+            import httpx
+        except ImportError:
+            httpx = None
+        self._is_httpx = httpx is not None
+        if httpx is not None:
+            # Transport-level retries only cover connect errors; retryable
+            # HTTP statuses are handled by _retry_request so this path gets
+            # the same resilience the requests fallback gets from
+            # _make_adapter's urllib3 Retry.
+            self.session = httpx.Client(
+                headers={"X-Key": self.api_key},
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                transport=httpx.HTTPTransport(
+                    retries=4,
+                    http2=True,
+                    limits=httpx.Limits(max_keepalive_connections=16)
+                )
+            )
+            # httpx carries its (connect, read) timeouts on the client.
+            self._timeout = httpx.USE_CLIENT_DEFAULT
+        else:
+            import requests
+            self.session = requests.Session()
+            self.session.headers.update({"X-Key": self.api_key})
+            self.session.mount("https://", _make_adapter())
+            self._timeout = (5, 30)
+        # Assume the API accepts a server-side wait on /v1/get_result until
+        # it tells us otherwise; cleared on the first 400/404 rejection.
+        self._server_wait = True
+
+    def _retry_request(self, method: str, url: str, **kwargs):
+        """Issue a request on the httpx client, retrying retryable statuses.
+
+        Mirrors the urllib3 Retry policy the requests fallback gets from
+        _make_adapter (429/502/503/504, bounded attempts, Retry-After wins
+        over the backoff schedule); the transport's retries= only covers
+        connect errors.
+        """
+        backoff = 0.5
+        for attempt in range(4):
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code not in (429, 502, 503, 504) or attempt == 3:
+                return response
+            delay = backoff
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    delay = min(float(retry_after), 8.0)
+                except ValueError:
+                    pass
+            time.sleep(delay)
+            backoff *= 2
+
+    def _get(self, url: str, **kwargs):
+        if self._is_httpx:
+            return self._retry_request('GET', url, **kwargs)
+        return self.session.get(url, **kwargs)
+
+    def _post_json(self, url: str, payload: dict):
+        """POST a payload serialized once with the fastest available codec.
+
+        Serializing ourselves and sending raw bytes avoids the extra
+        escaped-string copy requests' json= path builds for multi-MB
+        base64 payloads.
+        """
+        body = _json_dumps(payload)
+        headers = {"Content-Type": "application/json"}
+        if self._is_httpx:
+            return self._retry_request('POST', url, content=body, headers=headers, timeout=self._timeout)
+        return self.session.post(url, data=body, headers=headers, timeout=self._timeout)
+
     def encode_image(self, image_path: str) -> str:
         """Convert an image file to base64 string."""
-        with open(image_path, 'rb') as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        st = os.stat(image_path)
+        return _encode_image_cached(image_path, st.st_mtime, st.st_size)
     
     def save_image_from_url(self, url: str, filename: str, target_width: int = None, target_height: int = None) -> bool:
         """Download and save image from URL."""
+        from PIL import Image
         try:
-            response = requests.get(url)
+            response = _download_session().get(url, timeout=(5, 30))
             response.raise_for_status()
-            
-            # Save the original image
-            with open(filename, 'wb') as f:
-                f.write(response.content)
-            
-            # If target dimensions are specified, resize the image
+
+            resized = False
             if target_width and target_height:
-                with Image.open(filename) as img:
-                    # Resize image maintaining aspect ratio
-                    img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-                    # Save resized image
-                    img.save(filename, quality=95)
-            
+                with Image.open(BytesIO(response.content)) as img:
+                    if img.size != (target_width, target_height):
+                        # LANCZOS only earns its cost on heavy downscales;
+                        # BILINEAR is faster and indistinguishable for mild ones.
+                        shrink = min(img.width / target_width, img.height / target_height)
+                        resample = Image.Resampling.LANCZOS if shrink > 2 else Image.Resampling.BILINEAR
+                        img = img.resize((target_width, target_height), resample)
+                        img.save(filename, quality=95)
+                        resized = True
+
+            if not resized:
+                # Already the right size (or no target given): write the
+                # original bytes untouched, skipping the decode+re-encode.
+                with open(filename, 'wb') as f:
+                    f.write(response.content)
+
             print(f"✨ Saved as {filename}")
             return True
         except Exception as e:
@@ -58,54 +236,103 @@ class FluxAPI:
             return False
     
     def get_task_result(self, task_id: str, silent: bool = False) -> Optional[dict]:
-        """Poll for task result."""
-        max_attempts = 30
-        attempt = 0
-        
+        """Poll for task result with exponential backoff.
+
+        Starts polling quickly so fast jobs return in well under a second,
+        then backs off towards a capped delay so long jobs don't hammer the
+        API, with an overall deadline instead of a fixed attempt count.
+
+        First tries long polling (a 'wait' query param asking the server to
+        hold the request until the task finishes), which collapses the loop
+        into roughly one round-trip; falls back to short polling if the API
+        rejects the parameter.
+        """
+        delay = 0.5
+        max_delay = 8.0
+        deadline = time.monotonic() + 180
+
         print("Processing image...", file=sys.stderr)
-        while attempt < max_attempts:
+        attempt = 0
+        while time.monotonic() < deadline:
+            attempt += 1
             if not silent:
-                print(f"Processing image... (attempt {attempt + 1}/{max_attempts})", file=sys.stderr)
-            
-            response = requests.get(f"{self.base_url}/v1/get_result", params={'id': task_id})
-            result = response.json()
-            
+                print(f"Processing image... (attempt {attempt})", file=sys.stderr)
+
+            if self._server_wait:
+                response = self._get(
+                    f"{self.base_url}/v1/get_result",
+                    params={'id': task_id, 'wait': 30},
+                    timeout=35
+                )
+                if response.status_code in (400, 404):
+                    # Server doesn't understand 'wait'; drop to short polling
+                    # for this and every subsequent request on this session.
+                    self._server_wait = False
+                    continue
+            else:
+                response = self._get(
+                    f"{self.base_url}/v1/get_result",
+                    params={'id': task_id},
+                    timeout=self._timeout
+                )
+            # Parse the raw bytes directly; this runs once per poll so the
+            # faster codec keeps parsing off the critical path between polls.
+            result = _json_loads(response.content)
+
             if result['status'] == 'Ready':
                 return result
             elif result['status'] == 'failed':
                 print(f"Task failed: {result.get('error', 'Unknown error')}", file=sys.stderr)
                 return None
-            
-            attempt += 1
-            time.sleep(2)
-        
+
+            # Honor a server-provided hint if present, otherwise back off.
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    delay = min(float(retry_after), max_delay)
+                except ValueError:
+                    pass
+            time.sleep(delay)
+            delay = min(delay * 1.6, max_delay)
+
         print("Timeout waiting for result", file=sys.stderr)
         return None
 
-    def generate_image(self, prompt: str, model: str = "flux.1.1-pro", width: int = None, height: int = None, aspect_ratio: str = None) -> Optional[str]:
-        """Generate an image using any FLUX model."""
-        endpoint = {
-            "flux.1.1-pro": "/v1/flux-pro-1.1",
-            "flux.1-pro": "/v1/flux-pro",
-            "flux.1-dev": "/v1/flux-dev",
-            "flux.1.1-ultra": "/v1/flux-pro-1.1-ultra",
-        }.get(model)
-        
+    def wait_all(self, task_ids, max_workers: int = 8) -> list:
+        """Wait for several in-flight tasks and return their results in order.
+
+        Each task is polled by get_task_result in its own thread, so the
+        queue service works on all of them simultaneously and total wall
+        time is roughly the slowest job rather than the sum. With the
+        HTTP/2 client the concurrent polls multiplex over one socket.
+        """
+        workers = min(max_workers, max(len(task_ids), 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(self.get_task_result, tid, True) if tid else None
+                for tid in task_ids
+            ]
+            return [f.result() if f else None for f in futures]
+
+    def _finish(self, task_id: Optional[str]) -> Optional[str]:
+        """Wait for one submitted task and return its sample URL."""
+        if not task_id:
+            return None
+        result = self.get_task_result(task_id)
+        if result and result.get('result', {}).get('sample'):
+            return result['result']['sample']
+        return None
+
+    def submit_generate(self, prompt: str, model: str = "flux.1.1-pro", width: int = None, height: int = None, aspect_ratio: str = None) -> Optional[str]:
+        """Submit a generation task and return its id without waiting."""
+        endpoint = _MODEL_ENDPOINTS.get(model)
+
         if not endpoint:
             raise ValueError(f"Unknown model: {model}")
-        
+
         # Set default dimensions based on aspect ratio if provided
         if aspect_ratio:
-            if aspect_ratio == '1:1':
-                width, height = 1024, 1024
-            elif aspect_ratio == '4:3':
-                width, height = 1024, 768
-            elif aspect_ratio == '3:4':
-                width, height = 768, 1024
-            elif aspect_ratio == '16:9':
-                width, height = 1024, 576
-            elif aspect_ratio == '9:16':
-                width, height = 576, 1024
+            width, height = _ASPECT_DIMENSIONS.get(aspect_ratio, (width, height))
         else:
             # Use defaults if neither aspect ratio nor dimensions are provided
             width = width or 1024
@@ -117,66 +344,68 @@ class FluxAPI:
             "height": height,
             "aspect_ratio": aspect_ratio if aspect_ratio else None
         }
-        response = requests.post(
-            f"{self.base_url}{endpoint}",
-            json=payload,
-            headers=self.headers
-        )
-        
-        task_id = response.json().get('id')
+        response = self._post_json(f"{self.base_url}{endpoint}", payload)
+
+        task_id = _json_loads(response.content).get('id')
         if not task_id:
             print("Failed to start generation task", file=sys.stderr)
             return None
-            
-        result = self.get_task_result(task_id)
-        if result and result.get('result', {}).get('sample'):
-            return result['result']['sample']
-        return None
+        return task_id
 
-    def create_mask(self, size: tuple, shape: str = 'rectangle', position: str = 'center') -> Image:
+    def generate_image(self, prompt: str, model: str = "flux.1.1-pro", width: int = None, height: int = None, aspect_ratio: str = None) -> Optional[str]:
+        """Generate an image using any FLUX model."""
+        return self._finish(self.submit_generate(
+            prompt, model=model, width=width, height=height, aspect_ratio=aspect_ratio))
+
+    def create_mask(self, size: tuple, shape: str = 'rectangle', position: str = 'center') -> "Image.Image":
         """Create a mask for inpainting."""
-        mask = Image.new('L', size, 0)
-        draw = ImageDraw.Draw(mask)
-        
+        from PIL import Image
+        import numpy as np
+
         width, height = size
-        
+
+        # Axis-aligned regions are filled with a numpy slice assignment -
+        # a single memset rather than ImageDraw's per-scanline rasterizer.
         if position == 'ground':
             horizon_y = height * 0.65
             y_start = horizon_y - (height * 0.05)
-            points = [
-                (0, y_start),
-                (0, height),
-                (width, height),
-                (width, y_start)
-            ]
-            draw.polygon(points, fill=255)
-        else:
+            arr = np.zeros((height, width), dtype=np.uint8)
+            arr[int(y_start):, :] = 255
+            return Image.fromarray(arr, 'L')
+
+        if shape == 'rectangle':
             x1 = width * 0.25
             y1 = height * 0.25
             x2 = width * 0.75
             y2 = height * 0.75
-            
-            if shape == 'rectangle':
-                draw.rectangle([x1, y1, x2, y2], fill=255)
-            else:  # circle
-                center = (width // 2, height // 2)
-                radius = min(width, height) // 4
-                draw.ellipse([center[0] - radius, center[1] - radius,
-                             center[0] + radius, center[1] + radius], fill=255)
-        
-        return mask
-
-    def inpaint(self, image_path: str, prompt: str, mask_shape: str = 'circle', position: str = 'center') -> Optional[str]:
-        """Inpaint an image using a mask."""
+            arr = np.zeros((height, width), dtype=np.uint8)
+            arr[int(y1):int(y2), int(x1):int(x2)] = 255
+            return Image.fromarray(arr, 'L')
+
+        # circle: the disk is a closed-form inequality, so evaluate it over
+        # the whole grid with broadcast ufuncs instead of ImageDraw's
+        # scanline fill.
+        cx, cy = width // 2, height // 2
+        radius = min(width, height) // 4
+        y, x = np.ogrid[:height, :width]
+        arr = (((x - cx) ** 2 + (y - cy) ** 2) <= radius * radius).astype(np.uint8) * 255
+        return Image.fromarray(arr, 'L')
+
+    def submit_inpaint(self, image_path: str, prompt: str, mask_shape: str = 'circle', position: str = 'center') -> Optional[str]:
+        """Submit an inpaint task and return its id without waiting."""
+        from PIL import Image
         base_image = Image.open(image_path)
         mask = self.create_mask(base_image.size, shape=mask_shape, position=position)
-        
-        mask_path = 'temp_mask.jpg'
-        mask.save(mask_path)
-        
+
+        # Encode the mask straight from memory: no temp file round-trip, and
+        # PNG keeps the binary mask lossless where JPEG would blur its edges.
+        mask_buffer = BytesIO()
+        mask.save(mask_buffer, format='PNG', optimize=False)
+        mask_b64 = _b64.b64encode(mask_buffer.getvalue()).decode('utf-8')
+
         payload = {
             "image": self.encode_image(image_path),
-            "mask": self.encode_image(mask_path),
+            "mask": mask_b64,
             "prompt": prompt,
             "steps": 50,
             "guidance": 60,
@@ -184,39 +413,22 @@ class FluxAPI:
             "safety_tolerance": 2
         }
         
-        response = requests.post(
-            f"{self.base_url}/v1/flux-pro-1.0-fill",
-            json=payload,
-            headers=self.headers
-        )
-        
-        os.remove(mask_path)
-        
-        task_id = response.json().get('id')
+        response = self._post_json(f"{self.base_url}/v1/flux-pro-1.0-fill", payload)
+
+        task_id = _json_loads(response.content).get('id')
         if not task_id:
             print("Failed to start inpaint task", file=sys.stderr)
             return None
-            
-        result = self.get_task_result(task_id)
-        if result and result.get('result', {}).get('sample'):
-            return result['result']['sample']
-        return None
+        return task_id
 
-    def control_generate(self, control_type: str, control_image: str, prompt: str, **kwargs) -> Optional[str]:
-        """Generate an image using any supported control type."""
-        endpoints = {
-            'canny': '/v1/flux-pro-1.0-canny',
-            'depth': '/v1/flux-pro-1.0-depth',
-            'pose': '/v1/flux-pro-1.0-pose'
-        }
-        
-        default_params = {
-            'canny': {'guidance': 30},
-            'depth': {'guidance': 15},
-            'pose': {'guidance': 25}
-        }
-        
-        if control_type not in endpoints:
+    def inpaint(self, image_path: str, prompt: str, mask_shape: str = 'circle', position: str = 'center') -> Optional[str]:
+        """Inpaint an image using a mask."""
+        return self._finish(self.submit_inpaint(
+            image_path, prompt, mask_shape=mask_shape, position=position))
+
+    def submit_control(self, control_type: str, control_image: str, prompt: str, **kwargs) -> Optional[str]:
+        """Submit a control-guided task and return its id without waiting."""
+        if control_type not in _CONTROL_ENDPOINTS:
             raise ValueError(f"Unsupported control type: {control_type}")
             
         payload = {
@@ -227,37 +439,29 @@ class FluxAPI:
             "safety_tolerance": kwargs.get('safety_tolerance', 2)
         }
         
-        payload.update(default_params.get(control_type, {}))
+        payload.update(_CONTROL_DEFAULTS.get(control_type, {}))
         payload.update(kwargs)
+
+        response = self._post_json(f"{self.base_url}{_CONTROL_ENDPOINTS[control_type]}", payload)
         
-        response = requests.post(
-            f"{self.base_url}{endpoints[control_type]}",
-            json=payload,
-            headers=self.headers
-        )
-        
-        task_id = response.json().get('id')
+        task_id = _json_loads(response.content).get('id')
         if not task_id:
             print(f"Failed to start control ({control_type}) task", file=sys.stderr)
             return None
-            
-        result = self.get_task_result(task_id)
-        if result and result.get('result', {}).get('sample'):
-            return result['result']['sample']
-        return None
+        return task_id
+
+    def control_generate(self, control_type: str, control_image: str, prompt: str, **kwargs) -> Optional[str]:
+        """Generate an image using any supported control type."""
+        return self._finish(self.submit_control(control_type, control_image, prompt, **kwargs))
+
+    def submit_img2img(self, image_path: str, prompt: str, model: str = "flux.1.1-pro", strength: float = 0.75, width: int = None, height: int = None) -> Optional[str]:
+        """Submit an image-to-image task and return its id without waiting."""
+        from PIL import Image
+        endpoint = _MODEL_ENDPOINTS.get(model)
 
-    def img2img(self, image_path: str, prompt: str, model: str = "flux.1.1-pro", strength: float = 0.75, width: int = None, height: int = None) -> Optional[str]:
-        """Generate an image using another image as reference"""
-        endpoint = {
-            "flux.1.1-pro": "/v1/flux-pro-1.1",
-            "flux.1-pro": "/v1/flux-pro",
-            "flux.1-dev": "/v1/flux-dev",
-            "flux.1.1-ultra": "/v1/flux-pro-1.1-ultra",
-        }.get(model)
-        
         if not endpoint:
             raise ValueError(f"Unknown model: {model}")
-            
+
         with Image.open(image_path) as img:
             orig_width, orig_height = img.size
             
@@ -271,10 +475,24 @@ class FluxAPI:
                 max_area = 1048576
                 width = int((max_area / aspect_ratio) ** 0.5)
                 height = int(width * aspect_ratio)
-            
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG", quality=95)
-            image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+
+            if (width, height) == (orig_width, orig_height):
+                image_base64 = None
+            else:
+                # draft() lets the JPEG decoder downscale during decode
+                # (1/2, 1/4, 1/8 IDCT scaling), which is far cheaper than
+                # decoding full-res and resampling after; it's a no-op for
+                # non-JPEG sources. thumbnail() then hits the exact target.
+                img.draft('RGB', (width, height))
+                img.thumbnail((width, height), Image.Resampling.LANCZOS)
+                buffered = BytesIO()
+                img.save(buffered, format="JPEG", quality=90, optimize=False, progressive=False)
+                image_base64 = _b64.b64encode(buffered.getvalue()).decode('utf-8')
+
+        if image_base64 is None:
+            # Dimensions unchanged: send the file bytes as-is instead of
+            # paying a full decode + JPEG re-encode of an untouched image.
+            image_base64 = self.encode_image(image_path)
 
         payload = {
             "prompt": prompt,
@@ -288,26 +506,52 @@ class FluxAPI:
             "preserve_init_image_color_profile": True
         }
         
-        response = requests.post(
-            f"{self.base_url}{endpoint}",
-            headers=self.headers,
-            json=payload
-        )
-        
-        task_id = response.json().get('id')
+        response = self._post_json(f"{self.base_url}{endpoint}", payload)
+
+        task_id = _json_loads(response.content).get('id')
         if not task_id:
             print("Failed to start image-to-image task", file=sys.stderr)
             return None
-            
-        result = self.get_task_result(task_id)
-        if result and result.get('result', {}).get('sample'):
-            return result['result']['sample']
-        return None
+        return task_id
+
+    def img2img(self, image_path: str, prompt: str, model: str = "flux.1.1-pro", strength: float = 0.75, width: int = None, height: int = None) -> Optional[str]:
+        """Generate an image using another image as reference"""
+        return self._finish(self.submit_img2img(
+            image_path, prompt, model=model, strength=strength, width=width, height=height))
+
+# Re-encode a streamed response as WebP; returns (format, bytes). On failure
+# the original bytes are re-fetched and served untouched.
+def _convert_to_webp(response, image_url: str, save_format: str):
+    from PIL import Image
+    try:
+        # Decode straight off the socket instead of buffering the whole
+        # body into bytes first and reparsing it from a BytesIO.
+        response.raw.decode_content = True
+        img = Image.open(response.raw)
+
+        # Use RGBA for PNG source to preserve transparency, RGB otherwise
+        if img.mode == 'P' or (save_format == 'png' and 'A' in img.mode):
+            img = img.convert('RGBA')
+        else:
+            img = img.convert('RGB') # Convert to RGB for WEBP saving
+
+        output_buffer = BytesIO()
+        # method=4 trades a sliver of compression for a ~2x faster encode
+        img.save(output_buffer, format='WEBP', quality=90, method=4)
+        return 'webp', output_buffer.getvalue()
+    except Exception as convert_err:
+        print(f"Warning: Failed to convert image to WebP: {convert_err}. Serving original format.", file=sys.stderr)
+        # The stream may be partially consumed; re-fetch the original
+        # bytes so the fallback still serves the untouched image.
+        fallback = _download_session().get(image_url, timeout=(5, 30))
+        fallback.raise_for_status()
+        return save_format, fallback.content
 
 # Function to fetch image and return format/data or save to file
 def handle_image_url(image_url: str, output_path: Optional[str] = None, fetch_base64: bool = False, to_webp: bool = False):
+    import requests
     try:
-        response = requests.get(image_url, stream=True)
+        response = _download_session().get(image_url, stream=True, timeout=(5, 30))
         response.raise_for_status()
 
         content_type = response.headers.get('content-type', 'image/jpeg')
@@ -316,31 +560,28 @@ def handle_image_url(image_url: str, output_path: Optional[str] = None, fetch_ba
         # Pillow generally uses file extensions for saving, but we need format for base64.
         save_format = original_format if original_format in ['png', 'gif'] else 'jpeg'
 
-        image_bytes = response.content
+        if not output_path and not fetch_base64:
+            # Return URL: the body isn't needed at all, don't download it.
+            response.close()
+            return json.dumps({"status": "success", "url": image_url})
 
         # --- WebP Conversion Logic ---
         final_format = save_format
-        final_image_bytes = image_bytes
-        
-        if to_webp and (output_path or fetch_base64):
-            try:
-                img = Image.open(BytesIO(image_bytes))
-                
-                # Use RGBA for PNG source to preserve transparency, RGB otherwise
-                if img.mode == 'P' or (save_format == 'png' and 'A' in img.mode): 
-                     img = img.convert('RGBA')
-                else:
-                    img = img.convert('RGB') # Convert to RGB for WEBP saving
+        final_image_bytes = None
 
-                output_buffer = BytesIO()
-                img.save(output_buffer, format='WEBP', quality=90) # Changed quality to 90
-                final_image_bytes = output_buffer.getvalue()
+        if to_webp:
+            content_length = int(response.headers.get('content-length') or 0)
+            if original_format == 'webp':
+                # Already WebP: pass the bytes through; a re-encode costs
+                # CPU and quality for nothing.
                 final_format = 'webp'
-            except Exception as convert_err:
-                print(f"Warning: Failed to convert image to WebP: {convert_err}. Serving original format.", file=sys.stderr)
-                # Fallback to original bytes and format if conversion fails
-                final_format = save_format
-                final_image_bytes = image_bytes
+            elif 0 < content_length < 200_000:
+                # Small images rarely shrink under re-encode (and can even
+                # inflate); serve the original and skip the decode+encode.
+                pass
+            else:
+                final_format, final_image_bytes = _convert_to_webp(
+                    response, image_url, save_format)
         # --- End WebP Conversion ---
 
         if output_path:
@@ -348,20 +589,24 @@ def handle_image_url(image_url: str, output_path: Optional[str] = None, fetch_ba
             if final_format == 'webp':
                 base, _ = os.path.splitext(output_path)
                 output_path = base + '.webp'
-            
+
             abs_output_path = os.path.abspath(output_path)
             os.makedirs(os.path.dirname(abs_output_path), exist_ok=True)
             with open(abs_output_path, 'wb') as f:
-                f.write(final_image_bytes) # Write final (potentially converted) bytes
+                if final_image_bytes is not None:
+                    f.write(final_image_bytes) # Write final (converted) bytes
+                else:
+                    # Raw passthrough: stream chunks to disk without holding
+                    # the full image in memory.
+                    for chunk in response.iter_content(chunk_size=65536):
+                        f.write(chunk)
             return json.dumps({"status": "saved", "path": abs_output_path})
-        
-        elif fetch_base64:
-            base64_data = base64.b64encode(final_image_bytes).decode('utf-8')
+
+        else: # fetch_base64
+            if final_image_bytes is None:
+                final_image_bytes = response.content
+            base64_data = _b64.b64encode(final_image_bytes).decode('utf-8')
             return json.dumps({"status": "success", "format": final_format, "data": base64_data})
-        
-        else: # Return URL
-            # URL doesn't change even if conversion *could* happen later
-            return json.dumps({"status": "success", "url": image_url})
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching image from URL {image_url}: {e}", file=sys.stderr)
@@ -373,6 +618,50 @@ def handle_image_url(image_url: str, output_path: Optional[str] = None, fetch_ba
         print(f"An unexpected error occurred: {e}", file=sys.stderr)
         sys.exit(1)
 
+# Dispatch one command against a shared FluxAPI instance and return the
+# submitted task id without waiting. Used by both the single-shot CLI path
+# and batch mode, so batch jobs reuse the same Session (one TLS connection
+# pool) and caches - and batch can submit everything before polling.
+def _submit_command(api: FluxAPI, command: str, opts: dict) -> Optional[str]:
+    if command == 'generate':
+        return api.submit_generate(
+            prompt=opts['prompt'],
+            model=opts.get('model', 'flux.1.1-pro'),
+            aspect_ratio=opts.get('aspect_ratio'),
+            width=opts.get('width'),
+            height=opts.get('height')
+        )
+    elif command == 'img2img':
+        return api.submit_img2img(
+            image_path=opts['image'],
+            prompt=opts['prompt'],
+            model=opts.get('model', 'flux.1.1-pro'),
+            strength=opts.get('strength', 0.85),
+            width=opts.get('width'),
+            height=opts.get('height')
+        )
+    elif command == 'inpaint':
+        return api.submit_inpaint(
+            image_path=opts['image'],
+            prompt=opts['prompt'],
+            mask_shape=opts.get('mask_shape', 'circle'),
+            position=opts.get('position', 'center')
+        )
+    elif command == 'control':
+        extra = {'steps': opts.get('steps', 50)}
+        if opts.get('guidance') is not None:
+            extra['guidance'] = opts['guidance']
+        return api.submit_control(
+            control_type=opts['type'],
+            control_image=opts['image'],
+            prompt=opts['prompt'],
+            **extra
+        )
+    raise ValueError(f"Unknown command: {command}")
+
+def _run_command(api: FluxAPI, command: str, opts: dict) -> Optional[str]:
+    return api._finish(_submit_command(api, command, opts))
+
 def main():
     # Main parser
     parser = argparse.ArgumentParser(description="FLUX CLI - Image Generation Tool")
@@ -393,8 +682,8 @@ def main():
     # --- Generate command ---
     generate_parser = subparsers.add_parser('generate', help='Generate an image from a text prompt', parents=[base_image_parser])
     generate_parser.add_argument('--prompt', '-p', required=True, help='Text prompt for image generation')
-    generate_parser.add_argument('--model', '-m', choices=['flux.1.1-pro', 'flux.1-pro', 'flux.1-dev', 'flux.1.1-ultra'], default='flux.1.1-pro', help='Model to use for generation')
-    generate_parser.add_argument('--aspect-ratio', '-ar', choices=['1:1', '4:3', '3:4', '16:9', '9:16'], help='Aspect ratio of the output image')
+    generate_parser.add_argument('--model', '-m', choices=list(_MODEL_ENDPOINTS), default='flux.1.1-pro', help='Model to use for generation')
+    generate_parser.add_argument('--aspect-ratio', '-ar', choices=list(_ASPECT_DIMENSIONS), help='Aspect ratio of the output image')
     generate_parser.add_argument('--width', '-w', type=int, help='Image width (ignored if aspect-ratio is set)')
     generate_parser.add_argument('--height', type=int, help='Image height (ignored if aspect-ratio is set)')
 
@@ -404,7 +693,7 @@ def main():
     img2img_parser.add_argument('--image', required=True, help='Input image path')
     img2img_parser.add_argument('--prompt', '-p', required=True, help='Text prompt for generation')
     img2img_parser.add_argument('--name', required=True, help='Name for the generation')
-    img2img_parser.add_argument('--model', '-m', choices=['flux.1.1-pro', 'flux.1-pro', 'flux.1-dev', 'flux.1.1-ultra'], default='flux.1.1-pro', help='Model to use for generation')
+    img2img_parser.add_argument('--model', '-m', choices=list(_MODEL_ENDPOINTS), default='flux.1.1-pro', help='Model to use for generation')
     img2img_parser.add_argument('--strength', type=float, default=0.85, help='Generation strength')
     img2img_parser.add_argument('--width', '-w', type=int, help='Output image width')
     img2img_parser.add_argument('--height', type=int, help='Output image height')
@@ -420,53 +709,85 @@ def main():
 
     # --- Control command ---
     control_parser = subparsers.add_parser('control', help='ControlNet-like image generation', parents=[base_image_parser])
-    control_parser.add_argument('--type', required=True, choices=['canny', 'depth', 'pose'], help='Type of control to use')
+    control_parser.add_argument('--type', required=True, choices=list(_CONTROL_ENDPOINTS), help='Type of control to use')
     control_parser.add_argument('--image', required=True, help='Input control image path')
     control_parser.add_argument('--prompt', '-p', required=True, help='Text prompt for generation')
     control_parser.add_argument('--steps', type=int, default=50, help='Number of inference steps')
     control_parser.add_argument('--guidance', type=float, help='Guidance scale')
 
 
+    # --- Batch command ---
+    batch_parser = subparsers.add_parser('batch', help='Run many commands from JSONL on stdin over a single session')
+    batch_parser.add_argument('--jobs', '-j', type=int, default=4, help='Number of jobs to run concurrently')
+
+
     args = parser.parse_args()
     image_url = None # Variable to store the URL from the API call
 
     try:
         api = FluxAPI() # Assumes BFL_API_KEY is handled within FluxAPI or env vars
 
-        if args.command == 'generate':
-            image_url = api.generate_image(
-                prompt=args.prompt,
-                model=args.model,
-                aspect_ratio=args.aspect_ratio,
-                width=args.width,
-                height=args.height
-            )
-        elif args.command == 'img2img':
-             image_url = api.img2img(
-                 image_path=args.image,
-                 prompt=args.prompt,
-                 name=args.name,
-                 model=args.model,
-                 strength=args.strength,
-                 width=args.width,
-                 height=args.height
-             )
-        elif args.command == 'inpaint':
-             image_url = api.inpaint(
-                 image_path=args.image,
-                 prompt=args.prompt,
-                 mask_shape=args.mask_shape,
-                 position=args.position
-             )
-        elif args.command == 'control':
-             image_url = api.control_generate(
-                 type=args.type,
-                 image_path=args.image,
-                 prompt=args.prompt,
-                 steps=args.steps,
-                 guidance=args.guidance
-             )
-        # Add other command logic here if necessary
+        if args.command == 'batch':
+            # One JSON object per stdin line: {"command": ..., <command args>,
+            # "output"/"fetch_base64"/"to_webp" as in the single-shot CLI}.
+            # All jobs share this process, the FluxAPI session's connection
+            # pool, and the image caches; a thread pool overlaps their
+            # network waits.
+            jobs = []    # parsed job dicts, None where the line was bad
+            errors = []  # per-job error message, None where the job is fine
+            for line in sys.stdin:
+                if not line.strip():
+                    continue
+                try:
+                    jobs.append(json.loads(line))
+                    errors.append(None)
+                except ValueError as e:
+                    # One malformed line must not abort the whole batch:
+                    # record an error row for it and process the rest.
+                    jobs.append(None)
+                    errors.append(f"Invalid JSON line: {e}")
+
+            # Pipeline: submit every task up-front (each submit is one quick
+            # POST), then poll all the in-flight ids together, so the queue
+            # renders the whole batch in parallel and total wall time is
+            # roughly the slowest job instead of the sum.
+            task_ids = []
+            for i, job in enumerate(jobs):
+                if errors[i] is not None:
+                    task_ids.append(None)
+                    continue
+                try:
+                    task_ids.append(_submit_command(api, job.pop('command'), job))
+                except Exception as e:
+                    # A typo'd image path or unknown command in one job must
+                    # not abandon the tasks already submitted (they render
+                    # and bill regardless) or block the jobs after it.
+                    task_ids.append(None)
+                    errors[i] = f"Failed to submit job: {e}"
+            results = api.wait_all(task_ids, max_workers=max(args.jobs, 1))
+
+            def finish_job(job_result) -> str:
+                job, result, error = job_result
+                if error is not None:
+                    return json.dumps({"status": "error", "message": error})
+                sample = result.get('result', {}).get('sample') if result else None
+                if not sample:
+                    return json.dumps({"status": "error", "message": "Task did not produce an image URL."})
+                try:
+                    return handle_image_url(sample, job.get('output'), job.get('fetch_base64', False), job.get('to_webp', False))
+                except (Exception, SystemExit) as e:
+                    # handle_image_url exits the process on fetch/save errors,
+                    # which suits the single-shot CLI; in a batch one bad
+                    # download must not drop every remaining job's output.
+                    detail = "see stderr for details" if isinstance(e, SystemExit) else str(e)
+                    return json.dumps({"status": "error", "message": f"Failed to process result {sample}: {detail}"})
+
+            with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+                for result_json in pool.map(finish_job, zip(jobs, results, errors)):
+                    print(result_json)
+            return
+
+        image_url = _run_command(api, args.command, vars(args))
 
         if image_url:
             # Pass result to handler function, including the new to_webp flag